@@ -1,9 +1,39 @@
 import docker
+import functools
 import os
 
 # Docker SDK for Python
 # [Documentation](https://docker-py.readthedocs.io/en/stable/index.html)
 
+@functools.lru_cache(maxsize=1)
+def get_client():
+    """
+    Docker client connected to the local daemon, created once and reused
+    
+    Returns
+    -------
+    client: DockerClient
+    """
+    return docker.from_env()
+
+
+def get_container(container: 'str'):
+    """
+    Look up a Docker container. Looked up on every call, so its status is
+    current and a container recreated under the same name is found.
+    
+    Parameters
+    ----------
+    container: string
+        Name or ID of Docker container
+    
+    Returns
+    -------
+    container: Docker Container
+    """
+    return get_client().containers.get(container)
+
+
 def start_Docker_container(container: 'str'='upbeat_neumann'):
     """
     Start a Docker container
@@ -17,10 +47,8 @@ def start_Docker_container(container: 'str'='upbeat_neumann'):
     -------
     container: Docker Container
     """
-    client = docker.from_env()
-    
     try:
-        container = client.containers.get(container)
+        container = get_container(container)
         container.start()
         return container
     except docker.errors.NotFound as e:
@@ -28,6 +56,43 @@ def start_Docker_container(container: 'str'='upbeat_neumann'):
     
     return
 
+
+def start_ors(container: 'str'='ors-app'):
+    """
+    Start the openrouteservice container
+    
+    Parameters
+    ----------
+    container: string
+        Name or ID of Docker container
+    
+    Returns
+    -------
+    container: Docker Container
+    """
+    return start_Docker_container(container)
+
+
+def stop_ors(container: 'str'='ors-app'):
+    """
+    Stop the openrouteservice container
+    
+    Parameters
+    ----------
+    container: string
+        Name or ID of Docker container
+    
+    Returns
+    -------
+    None
+    """
+    try:
+        get_container(container).stop()
+    except docker.errors.NotFound as e:
+        print(e)
+    
+    return
+
 # Open Source Routing Machine (OSRM)
 # https://hub.docker.com/r/osrm/osrm-backend
 OSRM = [
@@ -57,7 +122,7 @@ def initialize_ors_container():
     
     APIError: 500 Server Error for http+docker://localhost/v1.41/containers/ef7f928c3e4c606090463a099dbbc9436c15754673fbed28f6408ce6240f8049/start: Internal Server Error ("unable to find user ${UID}: no matching entries in passwd file")
     """
-    container = client.containers.run(
+    container = get_client().containers.run(
         image='marteze/openrouteservice:latest',
         detach=True,               # -d
         tty=True,                  # -t
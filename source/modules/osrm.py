@@ -1,12 +1,99 @@
 import pandas as pd
 import numpy as np
+import functools
+import hashlib
+import json
+import logging
 import math
+import os
 import requests
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    # Optional, decodes considerably faster than the stdlib json
+    import orjson
+except ImportError:
+    orjson = None
 
 # Open Source Routing Machine (OSRM) API
 # Documentation: http://project-osrm.org/docs/v5.24.0/api/?language=Python
 
+logger = logging.getLogger(__name__)
+
+
+def _loads(content: 'bytes'):
+    """
+    Decode a JSON response body, with orjson when it is installed
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _dumps_sorted(obj):
+    """
+    Deterministic JSON encoding (sorted keys) used to build cache keys
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True).encode()
+
+
+def _encode_coords(coordinates):
+    """
+    OSRM coordinate string, longitude,latitude;longitude,latitude ...
+    Coordinates are written with 6 decimals (~0.1 m), which keeps urls short
+    and formats straight from float arrays without pandas row-wise work.
+    Coordinates already stored as strings are joined unchanged.
+    """
+    if (pd.api.types.is_string_dtype(coordinates['longitude'])
+            and pd.api.types.is_string_dtype(coordinates['latitude'])):
+        return ';'.join(
+            coordinates['longitude'].str.cat(coordinates['latitude'], sep=',')
+        )
+    
+    longitude = coordinates['longitude'].to_numpy(dtype=np.float64).tolist()
+    latitude = coordinates['latitude'].to_numpy(dtype=np.float64).tolist()
+    
+    return ';'.join(
+        [f'{lon:.6f},{lat:.6f}' for lon, lat in zip(longitude, latitude)]
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _range_string(start: 'int', stop: 'int', step: 'int'):
+    """
+    OSRM index list for a range, e.g. 0;1;2. The same source/destination
+    ranges repeat across every large_table tile, so the strings are cached.
+    """
+    return ';'.join(map(str, range(start, stop, step)))
+
+
+def _format_list(v: 'list'):
+    # Index lists (sources, destinations) are ';' separated, name lists
+    # (annotations, exclude) are ',' separated
+    if v and type(v[0]) is int:
+        return ';'.join(map(str, v))
+    if v and type(v[0]) is str:
+        return ','.join(v)
+    return v
+
+
+# Request option formatters by exact value type, bool is listed separately
+# from int since it is a subclass. Other types are passed through unchanged.
+_FORMATTERS = {
+    bool: lambda v: 'true' if v else 'false',
+    str: str.lower,
+    int: str,
+    range: lambda v: _range_string(v.start, v.stop, v.step),
+    list: _format_list,
+}
+
 class OSRM():
     """
     Python wrapper for the OSRM API v5.24.0
@@ -22,6 +109,11 @@ class OSRM():
         bike or foot if using one of the supplied profiles.
     format_:
         json or flatbuffers. This parameter is optional and defaults to json.
+    cache_size:
+        Maximum number of responses kept in the in-memory request cache.
+    cache_bytes:
+        Maximum total size in bytes of the responses kept in the request
+        cache, larger responses are not cached.
     
     General Request Options
     bearings: {bearing};{bearing}[;{bearing} ...]
@@ -52,6 +144,8 @@ class OSRM():
         base_url: 'str'='http://127.0.0.1:8080',
         version='v1',
         profile: 'str'='car',
+        cache_size: 'int'=256,
+        cache_bytes: 'int'=32 * 2**20,
         # default options
         # format_: 'str'='json',
         # bearings=None,
@@ -66,6 +160,13 @@ class OSRM():
         self.base_url = base_url
         self.version = version
         self.profile = profile
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        # Service URLs only differ by the coordinates, build the prefixes once
+        self._url_prefix = {
+            service: f'{base_url}/{service}/{version}/{profile}/'
+            for service in ('route', 'table', 'match', 'trip')
+        }
         # self.format = format_
         # self.bearings = bearings
         # self.radiuses = radiuses
@@ -76,6 +177,142 @@ class OSRM():
         # self.snapping = snapping
         # self.skip_waypoints = skip_waypoints
         
+        # Persistent HTTP session, reuses keep-alive connections between
+        # requests instead of opening a new TCP connection per call. The pool
+        # is sized for the concurrent requests of large_table and tsp.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.2)
+        )
+        self._session.mount(self.base_url, adapter)
+        
+        # LRU cache of raw response bodies keyed by request, shared between
+        # the threads of large_table
+        self._cache = OrderedDict()
+        self._cache_nbytes = 0
+        self._cache_lock = threading.Lock()
+        
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    
+    def get_session(self):
+        """
+        The pooled HTTP session used for all requests to the OSRM server
+        
+        Returns
+        -------
+        session: requests Session
+        """
+        return self._session
+    
+    
+    def cache_clear(self):
+        """
+        Empty the request cache
+        
+        Returns
+        -------
+        None
+        """
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_nbytes = 0
+        
+        return
+    
+    
+    def close(self):
+        """
+        Close the HTTP session and release pooled connections
+        
+        Returns
+        -------
+        None
+        """
+        self._session.close()
+        
+        return
+    
+    
+    def _get(
+        self,
+        service: 'str',
+        url: 'str',
+        parameters: 'dict',
+        cache: 'bool'=True
+    ):
+        """
+        Send a GET request to the OSRM server and decode the JSON body.
+        Successful responses are cached, so repeating a request with the same
+        coordinates and parameters does not hit the server again.
+        
+        Parameters
+        ----------
+        service: string
+            route, table, match or trip
+        url: string
+            Service url including coordinates
+        parameters: dictionary
+            Parsed query parameters
+        cache: true (default), false
+            Look up and store the response in the request cache. Requests
+            that are never repeated (e.g. large_table tiles) skip it.
+        
+        Returns
+        -------
+        response: dictionary
+            Decoded JSON response
+        """
+        content = None
+        
+        if cache:
+            key = hashlib.blake2b(
+                url.encode() + _dumps_sorted(parameters)
+            ).digest()
+            
+            with self._cache_lock:
+                content = self._cache.get(key)
+                if content is not None:
+                    self._cache.move_to_end(key)
+        
+        if content is None:
+            # Request timings are only measured when DEBUG logging is on
+            timed = logger.isEnabledFor(logging.DEBUG)
+            if timed:
+                tick = time.perf_counter()
+            # Stream the body and read it straight from the decoded socket,
+            # requests would otherwise buffer large table payloads in chunks
+            # before joining them into a second copy
+            with self._session.get(
+                url=url, params=parameters, stream=True
+            ) as response:
+                content = response.raw.read(decode_content=True)
+            if timed:
+                logger.debug('osrm %s: %.3fs', service,
+                             time.perf_counter() - tick)
+            
+            if cache and response.ok and len(content) <= self.cache_bytes:
+                with self._cache_lock:
+                    if key not in self._cache:
+                        self._cache[key] = content
+                        self._cache_nbytes += len(content)
+                    # Evict least recently used responses until both the
+                    # entry and byte limits hold
+                    while (len(self._cache) > self.cache_size
+                           or self._cache_nbytes > self.cache_bytes):
+                        _, evicted = self._cache.popitem(last=False)
+                        self._cache_nbytes -= len(evicted)
+        
+        return _loads(content)
+    
     
     def parse_parameters(
         self,
@@ -84,8 +321,8 @@ class OSRM():
         """
         Parameters
         ----------
-        params: locals()
-            Dictionary of function parameters
+        params: dictionary
+            Request options by name, options set to None are omitted
         
         Returns
         -------
@@ -93,25 +330,18 @@ class OSRM():
             Parsed parameters
         """
         
-        # Remove forbidden keys
-        params = {k: v for k, v in params.items() 
-                  if k not in ['self', 'coordinates', 'url'] 
-                  if v is not None}
+        parsed = {}
         
+        # Single pass: skip unset options, then format with a lookup on the
+        # exact value type
         for k, v in params.items():
-            if isinstance(v, bool):
-                params[k] = str(v).lower()
-            elif isinstance(v, str):
-                params[k] = v.lower()
-            elif isinstance(v, int):
-                params[k] = str(v)
-            elif isinstance(v, list):
-                if isinstance(v[0], int):
-                    params[k] = ';'.join([str(_) for _ in v])
-                elif isinstance(v[0], str):
-                    params[k] = ','.join([str(_) for _ in v])
+            if v is None:
+                continue
+            
+            fmt = _FORMATTERS.get(type(v))
+            parsed[k] = fmt(v) if fmt is not None else v
 
-        return params
+        return parsed
     
     
     def parse_coordinates(
@@ -132,14 +362,13 @@ class OSRM():
         -------
         coordinates: string
         """
+        if coordinates.shape[0] == 0:
+            return ''
+        
         # Parse coordinates
-        coordinates = (
-            coordinates[['longitude', 'latitude']].astype(str)
-            .agg(','.join, axis=1)
-            .str.cat(sep=';')
-        )
+        coordinates_str = _encode_coords(coordinates)
         
-        return coordinates
+        return coordinates_str
     
     
     def route(
@@ -188,34 +417,75 @@ class OSRM():
 
         Returns
         -------
-        response: Requests response object
+        response: dictionary
+            Decoded JSON response
         """
         
         # Parse parameters
-        parameters = self.parse_parameters(params=locals())
+        parameters = self.parse_parameters(params={
+            'alternatives': alternatives,
+            'steps': steps,
+            'annotations': annotations,
+            'geometries': geometries,
+            'overview': overview,
+            'continue_straight': continue_straight,
+            'waypoints': waypoints,
+        })
         
         # Parse coordinates
         coordinates = self.parse_coordinates(coordinates)
 
-        url = (f'{self.base_url}/route/{self.version}/{self.profile}/'
-               + coordinates)
+        url = self._url_prefix['route'] + coordinates
 
-        tick = time.time()
-        response = requests.get(url=url, params=parameters)
-        print(time.time() - tick)
+        response = self._get(service='route', url=url, parameters=parameters)
         
         return response
 
 
+    def route_many(
+        self,
+        coordinates_list,
+        **options
+    ):
+        """
+        Find the fastest route for each of several coordinate sets. The
+        requests are independent, so they are sent concurrently over the
+        pooled session.
+        
+        Parameters
+        ----------
+        coordinates_list: list of DF, GDF
+            Each must contain features ['longitude', 'latitude']
+        **options
+            Keyword arguments passed to route for every request
+        
+        Returns
+        -------
+        responses: list of dictionaries
+            Decoded JSON responses in the order of coordinates_list
+        """
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            responses = list(executor.map(
+                lambda coordinates: self.route(coordinates, **options),
+                coordinates_list
+            ))
+        
+        return responses
+    
+    
     def table(
         self,
         coordinates,
-        sources: "list | 'all'"='all',
-        destinations: "list | 'all'"='all',
+        sources: "list | range | 'all'"='all',
+        destinations: "list | range | 'all'"='all',
         annotations: 'str | list(str)'='duration',
         fallback_speed: 'float'=None,
         fallback_coordinate: 'str'='input',
-        scale_factor: 'float'=None
+        scale_factor: 'float'=None,
+        generate_hints: 'bool | None'=None,
+        skip_waypoints: 'bool | None'=None,
+        coordinates_str: 'str | None'=None,
+        cache: 'bool'=True
     ):
         """
         Computes the duration of the fastest route between all pairs of
@@ -246,31 +516,237 @@ class OSRM():
         scale_factor: double > 0
             Use in conjunction with annotations=durations. Scales the table 
             duration values by this number.
+        generate_hints: true (default), false
+            Adds a Hint to each waypoint in the response.
+        skip_waypoints: true, false (default)
+            Removes the sources and destinations waypoints from the response.
+            Only the matrices are transferred and decoded, which is all the
+            numeric callers need.
+        coordinates_str: string, optional
+            Coordinates already in OSRM format (see parse_coordinates), used
+            instead of parsing coordinates again.
+        cache: true (default), false
+            Keep the response in the in-memory request cache.
 
         Returns
         -------
-        response: Requests response object
+        response: dictionary
+            Decoded JSON response
         """
 
         # Parse parameters
-        parameters = self.parse_parameters(params=locals())
+        parameters = self.parse_parameters(params={
+            'sources': sources,
+            'destinations': destinations,
+            'annotations': annotations,
+            'fallback_speed': fallback_speed,
+            'fallback_coordinate': fallback_coordinate,
+            'scale_factor': scale_factor,
+            'generate_hints': generate_hints,
+            'skip_waypoints': skip_waypoints,
+        })
         
-        # Parse coordinates
-        coordinates = self.parse_coordinates(coordinates)
+        # Parse coordinates, unless the caller already did
+        if coordinates_str is None:
+            coordinates_str = self.parse_coordinates(coordinates)
         
-        url = (f'{self.base_url}/table/{self.version}/{self.profile}/'
-               + coordinates)
+        url = self._url_prefix['table'] + coordinates_str
 
-        tick = time.time()
-        response = requests.get(url=url, params=parameters)
-        print(time.time() - tick)
+        response = self._get(
+            service='table', url=url, parameters=parameters, cache=cache
+        )
         
         return response
     
     
+    def table_matrix(
+        self,
+        coordinates,
+        annotations: 'str'='duration'
+    ):
+        """
+        Full duration (or distance) matrix of all coordinates from a single
+        table request, without a csv round-trip. The server's max-table-size
+        (100 by default) limits the number of coordinates, use large_table
+        beyond that.
+        
+        Parameters
+        ----------
+        coordinates
+            DF, GDF
+            Must contain features ['longitude', 'latitude']
+        annotations: duration (default) or distance
+        
+        Returns
+        -------
+        matrix: numpy array of shape (n, n)
+        """
+        num_locations = coordinates.shape[0]
+        
+        payload = self.table(
+            coordinates=coordinates,
+            sources='all',
+            destinations='all',
+            annotations=annotations,
+            skip_waypoints=True
+        )
+        
+        matrix = np.empty((num_locations, num_locations), dtype=np.float32)
+        matrix[...] = payload[f'{annotations}s']
+        
+        return matrix
+    
+    
+    def _table_tile(
+        self,
+        coordinates_str: 'str',
+        start_i: 'int',
+        end_i: 'int',
+        start_j: 'int',
+        end_j: 'int',
+        duration_matrix,
+        distance_matrix,
+        tile_dir: 'str | None'=None
+    ):
+        """
+        Request a single source/destination block of the table service and
+        write it into the duration and distance matrices in place
+        
+        Parameters
+        ----------
+        coordinates_str: string
+            Parsed coordinates of all locations
+        start_i, end_i: integer
+            Source index range
+        start_j, end_j: integer
+            Destination index range
+        duration_matrix, distance_matrix: numpy arrays
+            Preallocated output matrices
+        tile_dir: string, optional
+            Directory of previously saved tiles for these coordinates
+        
+        Returns
+        -------
+        None
+        """
+        block = np.s_[start_i:end_i, start_j:end_j]
+        
+        if tile_dir is not None:
+            tile_file = os.path.join(
+                tile_dir, f'{start_i}_{end_i}_{start_j}_{end_j}.npz'
+            )
+            
+            if os.path.exists(tile_file):
+                with np.load(tile_file) as tile:
+                    duration_matrix[block] = tile['durations']
+                    distance_matrix[block] = tile['distances']
+                return
+        
+        payload = self.table(
+            coordinates=None,
+            sources=range(start_i, end_i),
+            destinations=range(start_j, end_j),
+            annotations=['duration', 'distance'],
+            skip_waypoints=True,
+            coordinates_str=coordinates_str,
+            # Tiles are requested once, and kept on disk when tile_dir is set
+            cache=False
+        )
+        
+        # Assigning the decoded lists straight into the matrix views skips an
+        # intermediate array per tile. Unroutable pairs (null) become NaN.
+        duration_matrix[block] = payload['durations']
+        distance_matrix[block] = payload['distances']
+        
+        if tile_dir is not None:
+            # Write then rename so an interrupted run never leaves a partial
+            # tile behind
+            with open(f'{tile_file}.tmp', 'wb') as f:
+                np.savez(
+                    f,
+                    durations=duration_matrix[block],
+                    distances=distance_matrix[block]
+                )
+            os.replace(f'{tile_file}.tmp', tile_file)
+        
+        return
+    
+    
+    def one_to_many(
+        self,
+        coordinates,
+        source_idx: 'int',
+        annotations: 'str'='duration'
+    ):
+        """
+        Durations (or distances) from a single location to every location in
+        one table request
+        
+        Parameters
+        ----------
+        coordinates
+            DF, GDF
+            Must contain features ['longitude', 'latitude']
+        source_idx: integer
+            Index of the source location
+        annotations: duration (default) or distance
+        
+        Returns
+        -------
+        row: numpy array of shape (1, n)
+        """
+        payload = self.table(
+            coordinates=coordinates,
+            sources=[source_idx],
+            destinations='all',
+            annotations=annotations,
+            skip_waypoints=True
+        )
+        
+        return np.asarray(payload[f'{annotations}s'], dtype=np.float32)
+    
+    
+    def many_to_one(
+        self,
+        coordinates,
+        dest_idx: 'int',
+        annotations: 'str'='duration'
+    ):
+        """
+        Durations (or distances) from every location to a single location in
+        one table request
+        
+        Parameters
+        ----------
+        coordinates
+            DF, GDF
+            Must contain features ['longitude', 'latitude']
+        dest_idx: integer
+            Index of the destination location
+        annotations: duration (default) or distance
+        
+        Returns
+        -------
+        column: numpy array of shape (n, 1)
+        """
+        payload = self.table(
+            coordinates=coordinates,
+            sources='all',
+            destinations=[dest_idx],
+            annotations=annotations,
+            skip_waypoints=True
+        )
+        
+        return np.asarray(payload[f'{annotations}s'], dtype=np.float32)
+    
+    
     def large_table(
         self, 
         locations,
+        sources: 'int | None'=None,
+        destinations: 'int | None'=None,
+        cache_dir: 'str | None'=None,
+        save: 'bool'=True,
         # file_name: 'str | None'=None
     ):
         """
@@ -280,87 +756,116 @@ class OSRM():
         Parameters
         ----------
         locations: Dataframe
+        sources: integer, optional
+            Only calculate the row for this source location
+        destinations: integer, optional
+            Only calculate the column for this destination location
+        cache_dir: string, optional
+            Save each tile to this directory as it completes. Rerunning with
+            the same locations only requests the tiles that are missing, so
+            an interrupted run can be resumed.
+        save: true (default), false
+            Write the matrices to csv
         
         Returns
         -------
-        None
+        duration_matrix, distance_matrix: float32 numpy arrays
+            Can be passed straight to utilities.label_routes
         """
         
         num_locations = locations.shape[0]
         
-        duration_matrix = np.empty((0, num_locations))
-        distance_matrix = np.empty((0, num_locations))
-        # duration_matrix = pd.DataFrame()
+        timed = logger.isEnabledFor(logging.DEBUG)
+        if timed:
+            tick = time.perf_counter()
         
-        ceiling = math.ceil(num_locations / 100)
-
-        tick = time.time()
-
-        for i in range(ceiling):
-            start_i = i * 100
-            end_i = start_i + 100
-
-            duration_row = np.empty((100, 0))
-            distance_row = np.empty((100, 0))
-            # row = pd.DataFrame()
-
-            if end_i > num_locations:
-                end_i = num_locations
-                duration_row = np.empty((num_locations - start_i, 0))
-                distance_row = np.empty((num_locations - start_i, 0))
-
-            for j in range(ceiling):
-                start_j = j * 100
-                end_j = start_j + 100
-
-                if end_j > num_locations:
-                    end_j = num_locations
-
-                osrm_response = self.table(
-                    coordinates=locations,
-                    sources=list(range(start_i, end_i)),
-                    destinations=list(range(start_j, end_j)),
-                    annotations=['duration', 'distance']
-                )
-
-                duration_row = np.c_[
-                    duration_row, 
-                    np.array(osrm_response.json()['durations'])
-                ]
-                distance_row = np.c_[
-                    distance_row,
-                    np.array(osrm_response.json()['distances'])
-                ]
-                # row = pd.concat(
-                #    objs=[row, 
-                #          pd.DataFrame(osrm_response.json()['durations'])],
-                #     axis=1,
-                #     ignore_index=True
-                # )
-            duration_matrix = np.r_[duration_matrix, duration_row]
-            distance_matrix = np.r_[distance_matrix, distance_row]
-            # duration_matrix = pd.concat(
-            #     objs=[duration_matrix, row],
-            #     axis=0,
-            #     ignore_index=True
-            # )
-        print('time', time.time() - tick)
-        
-        np.savetxt(
-            fname=f'duration_matrix_{time.strftime("%Y%m%d-%H%M%S")}.csv',
-            X=duration_matrix,
-            fmt='%10.1f',
-            delimiter=','
-        )
-        np.savetxt(
-            fname=f'distance_matrix_{time.strftime("%Y%m%d-%H%M%S")}.csv',
-            X=distance_matrix,
-            fmt='%10.1f',
-            delimiter=','
-        )
-        # duration_matrix.to_csv('duration_matrix.csv', index=False)
+        # Parse the coordinates once for every request below
+        coordinates_str = self.parse_coordinates(locations)
         
-        return
+        if sources is not None or destinations is not None:
+            # A single row or column fits in one request, no tiling needed
+            payload = self.table(
+                coordinates=None,
+                sources='all' if sources is None else [sources],
+                destinations='all' if destinations is None else [destinations],
+                annotations=['duration', 'distance'],
+                skip_waypoints=True,
+                coordinates_str=coordinates_str
+            )
+            
+            duration_matrix = np.asarray(
+                payload['durations'], dtype=np.float32
+            )
+            distance_matrix = np.asarray(
+                payload['distances'], dtype=np.float32
+            )
+            
+        else:
+            # float32 is ample precision for seconds and metres and halves
+            # the memory of the n x n matrices
+            duration_matrix = np.empty(
+                (num_locations, num_locations), dtype=np.float32
+            )
+            distance_matrix = np.empty(
+                (num_locations, num_locations), dtype=np.float32
+            )
+            
+            tile_dir = None
+            
+            if cache_dir is not None:
+                # Tiles are only valid for the same server, profile and
+                # coordinates
+                tile_dir = os.path.join(cache_dir, hashlib.blake2b(
+                    f'{self.base_url}/{self.profile}/{coordinates_str}'
+                    .encode(),
+                    digest_size=16
+                ).hexdigest())
+                os.makedirs(tile_dir, exist_ok=True)
+            
+            ceiling = math.ceil(num_locations / 100)
+            
+            # Tile boundaries (start_i, end_i, start_j, end_j) of 100 x 100
+            # source/destination blocks
+            tiles = [
+                (i * 100, min(i * 100 + 100, num_locations),
+                 j * 100, min(j * 100 + 100, num_locations))
+                for i in range(ceiling)
+                for j in range(ceiling)
+            ]
+            
+            # Tiles are independent requests, so issue them concurrently
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                # Consume the results so request errors are raised here
+                list(executor.map(
+                    lambda tile: self._table_tile(
+                        coordinates_str, *tile,
+                        duration_matrix, distance_matrix, tile_dir
+                    ),
+                    tiles
+                ))
+        
+        if timed:
+            logger.debug('osrm large_table: %.3fs', time.perf_counter() - tick)
+        
+        if save:
+            # pandas' C writer is much faster than np.savetxt's per-row
+            # formatting
+            timestamp = time.strftime("%Y%m%d-%H%M%S")
+            
+            pd.DataFrame(duration_matrix).to_csv(
+                f'duration_matrix_{timestamp}.csv',
+                header=False,
+                index=False,
+                float_format='%.1f'
+            )
+            pd.DataFrame(distance_matrix).to_csv(
+                f'distance_matrix_{timestamp}.csv',
+                header=False,
+                index=False,
+                float_format='%.1f'
+            )
+        
+        return duration_matrix, distance_matrix
 
     
     def match(
@@ -421,21 +926,29 @@ class OSRM():
 
         Returns
         -------
-        response: Requests response object
+        response: dictionary
+            Decoded JSON response
         """
 
-       # Parse parameters
-        parameters = self.parse_parameters(params=locals())
+        # Parse parameters
+        parameters = self.parse_parameters(params={
+            'steps': steps,
+            'geometries': geometries,
+            'annotations': annotations,
+            'overview': overview,
+            'timestamps': timestamps,
+            'radiuses': radiuses,
+            'gaps': gaps,
+            'tidy': tidy,
+            'waypoints': waypoints,
+        })
         
         # Parse coordinates
         coordinates = self.parse_coordinates(coordinates)
 
-        url = (f'{self.base_url}/match/{self.version}/{self.profile}/'
-               + coordinates)
+        url = self._url_prefix['match'] + coordinates
 
-        tick = time.time()
-        response = requests.get(url=url, params=parameters)
-        print(time.time() - tick)
+        response = self._get(service='match', url=url, parameters=parameters)
         
         return response
 
@@ -488,21 +1001,27 @@ class OSRM():
 
         Returns
         -------
-        response: Requests response object
+        response: dictionary
+            Decoded JSON response
         """
 
         # Parse parameters
-        parameters = self.parse_parameters(params=locals())
+        parameters = self.parse_parameters(params={
+            'roundtrip': roundtrip,
+            'source': source,
+            'destination': destination,
+            'steps': steps,
+            'annotations': annotations,
+            'geometries': geometries,
+            'overview': overview,
+        })
         
         # Parse coordinates
         coordinates = self.parse_coordinates(coordinates)
 
-        url = (f'{self.base_url}/trip/{self.version}/{self.profile}/'
-               + coordinates)
+        url = self._url_prefix['trip'] + coordinates
 
-        tick = time.time()
-        response = requests.get(url=url, params=parameters)
-        print(time.time() - tick)
+        response = self._get(service='trip', url=url, parameters=parameters)
         
         return response
         
@@ -539,49 +1058,58 @@ class OSRM():
                 profiles). ACTUAL ROUTING USES THIS VALUE."
         """
         
-        route_table = pd.DataFrame()
+        route_dfs = []
+        route_stops = []
+
+        # Split by route once rather than scanning every address per route
+        by_route = dict(list(routes.groupby('route', sort=False)))
 
         for route in range(routes['route'].nunique()):
-            route_df = routes[routes['route'] == route]
+            route_df = by_route.get(route, routes.iloc[:0])
             # Stop count
-            stops = route_df.shape[0]
+            route_stops.append(route_df.shape[0])
 
             # Add warehouse as source
             route_df = pd.concat([source, route_df], axis=0)
+            route_dfs.append(route_df)
 
-            # Solve TSP
-            path = self.trip(
-                coordinates=route_df[:100],  # TSP solvable for maximum 100 stops
-                roundtrip=True,
-                source='first',
-                destination='any',
-                overview='full'
-            )
+        # Solve TSP, each route is an independent request so they are sent
+        # concurrently
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            trips = list(executor.map(
+                lambda route_df: self.trip(
+                    coordinates=route_df[:100],  # TSP solvable for maximum 100 stops
+                    roundtrip=True,
+                    source='first',
+                    destination='any',
+                    overview='full'
+                ),
+                route_dfs
+            ))
+
+        paths = []
 
+        for route, (path, stops) in enumerate(zip(trips, route_stops)):
             # Extract trip attributes and waypoints
             try:
                 # Geometry, distance, duration
-                attributes = pd.json_normalize(path.json(), record_path=['trips'])
+                attributes = pd.json_normalize(path, record_path=['trips'])
             except KeyError:
                 continue
 
-            # Waypoints
-            waypoints = pd.json_normalize(path.json())['waypoints']
-
-            path = pd.concat(
-                [attributes, waypoints],
-                axis=1
-            )
+            # Waypoints, taken straight from the decoded response rather than
+            # normalizing the whole document a second time
+            attributes['waypoints'] = [path['waypoints']] * len(attributes)
+            path = attributes
 
             # Number of stops
             path[['route', 'stops']] = [route, stops]
 
-            # Append route to table of routes
-            route_table = pd.concat(
-                [route_table, path],
-                axis=0,
-                ignore_index=True
-            )
+            paths.append(path)
+
+        # Single concat of all routes, concatenating inside the loop copies
+        # the growing table every iteration
+        route_table = pd.concat(paths, axis=0, ignore_index=True)
 
         # Drop uneccessary columns
         route_table.drop(['legs', 'weight_name'], axis=1, inplace=True)
@@ -1,8 +1,19 @@
 from modules import credentials
 
+import dbm
+import functools
+import os
+import shelve
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-import polyline
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import shapely
 
 import plotly.express as px
 import plotly.graph_objects as go
@@ -11,9 +22,16 @@ import googlemaps
 # Open Calgary API
 from sodapy import Socrata
 
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.cluster import AgglomerativeClustering
-from sklearn.pipeline import Pipeline
+from scipy.spatial.distance import cdist
+
+from sklearn.cluster import AgglomerativeClustering, MiniBatchKMeans
+from sklearn.neighbors import kneighbors_graph
+
+try:
+    # Optional, compiles the polyline decoder loop to machine code
+    import numba
+except ImportError:
+    numba = None
 
 
 YYC_STREET_TYPEs = {
@@ -66,6 +84,19 @@ YYC_STREET_TYPEs = {
     'WK': 'Walk',
     'WY': 'Way'
 }
+# Series form for vectorized lookups, e.g. codes.map(YYC_STREET_TYPE_SERIES)
+YYC_STREET_TYPE_SERIES = pd.Series(YYC_STREET_TYPEs)
+
+
+# Local copy of the Open Calgary Parcel Address dataset, see
+# load_yyc_addresses
+YYC_ADDRESS_FILE = '../data/yyc_parcel_address.parquet'
+_YYC_ADDR_DB = None
+
+# On-disk cache of Google Maps geocode results keyed by normalized address,
+# kept between sessions to avoid repeat API requests
+GEOCODE_CACHE_FILE = '../data/geocode_cache'
+_GEOCODE_CACHE_LOCK = threading.Lock()
 
 
 def get_warehouse():
@@ -82,15 +113,124 @@ def load_data():
     """
     Load Open Calgary address data set
     """
-    # Load saved sample file
+    # Load saved sample file, the pyarrow parser is multithreaded and keeps
+    # the addresses as arrow strings rather than Python objects
     add = pd.read_csv(
         '../data/openYYCtestdata.csv',
-        usecols=['address', 'longitude', 'latitude']
+        usecols=['address', 'longitude', 'latitude'],
+        dtype={'address': 'string[pyarrow]'},
+        engine='pyarrow'
     )
 
     return df_to_geodf(add)
 
 
+def _polyline_deltas(geometry: 'str'):
+    """
+    Integer lat/lon deltas of an encoded polyline, decoded with numpy instead
+    of a Python loop per byte. Each value is a run of 5-bit chunks ending at
+    the first byte below 0x20, the runs are summed with reduceat. Uses a
+    compiled loop instead when numba is installed.
+    
+    Parameters
+    ----------
+    geometry: polyline string
+    
+    Returns
+    -------
+    delta: numpy array of shape (n, 2), int64
+    """
+    if not geometry:
+        return np.empty((0, 2), dtype=np.int64)
+    
+    b = np.frombuffer(geometry.encode('ascii'), dtype=np.uint8)
+    
+    if numba is not None:
+        return _njit_deltas(b).reshape(-1, 2)
+    
+    b = b.astype(np.int64) - 63
+    
+    # First and last byte of every value
+    ends = np.flatnonzero(b < 0x20)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    
+    # Position of each byte within its value gives the shift of its chunk
+    shift = 5 * (np.arange(len(b)) - np.repeat(starts, ends - starts + 1))
+    result = np.add.reduceat((b & 0x1f) << shift, starts)
+    
+    # Undo the sign folding
+    delta = (result >> 1) ^ -(result & 1)
+    
+    return delta.reshape(-1, 2)
+
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _njit_deltas(buf):
+        # Single pass over the bytes, see _polyline_deltas
+        out = np.empty(len(buf), dtype=np.int64)
+        n = 0
+        result = 0
+        shift = 0
+        for c in buf:
+            b = np.int64(c) - 63
+            result |= (b & 0x1f) << shift
+            shift += 5
+            if b < 0x20:
+                out[n] = (result >> 1) ^ -(result & 1)
+                n += 1
+                result = 0
+                shift = 0
+        return out[:n]
+
+
+def _decode_polyline(geometry: 'str', precision: 'int'=5):
+    """
+    Decode an encoded polyline by accumulating its integer deltas
+    
+    Parameters
+    ----------
+    geometry: polyline string
+    precision: integer
+        Number of decimals encoded, 5 for OSRM polylines
+    
+    Returns
+    -------
+    lat, lon: numpy arrays, float64
+    """
+    coords = np.cumsum(_polyline_deltas(geometry), axis=0) / 10 ** precision
+    
+    return coords[:, 0], coords[:, 1]
+
+
+@functools.lru_cache(maxsize=256)
+def _decode_arrays(geometry: 'str'):
+    # Routes are decoded again by several stages (plotting, GeoDataframes),
+    # the arrays are read-only since they are shared between callers
+    lat, lon = _decode_polyline(geometry)
+    lat.flags.writeable = False
+    lon.flags.writeable = False
+    return lat, lon
+
+
+def polyline_to_xy(geometry: 'str'):
+    """
+    Decode a polyline string into coordinate arrays, without building a
+    GeoDataframe. Decoded polylines are cached.
+    
+    Parameters
+    ----------
+    geometry: polyline string
+    
+    Returns
+    -------
+    lat, lon: numpy arrays, read-only
+    """
+    return _decode_arrays(geometry)
+
+
 def polyline_to_geodf(geometry: 'str'):
     """
     Convert a polyline string to a GeoDataframe
@@ -103,15 +243,124 @@ def polyline_to_geodf(geometry: 'str'):
     -------
     a: GeoDataframe
     """
-    pl = polyline.decode(expression=geometry)
-    a = pd.DataFrame(pl, columns=['latitude', 'longitude'])
-    a = df_to_geodf(a)
+    # Decode to arrays and build all points in one vectorized call
+    lat, lon = polyline_to_xy(geometry)
+    a = gpd.GeoDataFrame(
+        {'latitude': lat, 'longitude': lon},
+        geometry=shapely.points(lon, lat),
+        crs='EPSG:4326'
+    )
     return a
 
 
+def polyline_to_line(geometry: 'str'):
+    """
+    Convert a polyline string to a single LineString, for callers that need
+    the route geometry rather than a POINT per vertex (see polyline_to_geodf)
+    
+    Parameters
+    ----------
+    geometry: polyline string
+    
+    Returns
+    -------
+    line: shapely LineString, in longitude/latitude order
+        An empty polyline gives an empty LineString. A polyline with a
+        single vertex raises ValueError, since a line needs two points.
+    """
+    lat, lon = polyline_to_xy(geometry)
+    
+    if len(lat) == 1:
+        raise ValueError('polyline has a single vertex, not a line')
+    
+    return shapely.linestrings(lon, lat)
+
+
+def expand_street_types(codes):
+    """
+    Full street type names for Open Calgary street type codes, e.g. 'DR' to
+    'Drive'
+    
+    Parameters
+    ----------
+    codes: Series of strings
+    
+    Returns
+    -------
+    names: Series of strings, unknown codes are missing
+    """
+    return codes.str.upper().map(YYC_STREET_TYPE_SERIES)
+
+
+def save_polyline_npz(path: 'str', geometry: 'str'):
+    """
+    Save a polyline as int32 lat/lon deltas, so it can be reloaded without
+    decoding the string again (see load_polyline_npz)
+    
+    Parameters
+    ----------
+    path: string
+        Filename of the .npz file
+    geometry: polyline string
+    
+    Returns
+    -------
+    None
+    """
+    delta = _polyline_deltas(geometry).astype(np.int32)
+    
+    np.savez_compressed(
+        path,
+        lat_i32=delta[:, 0],
+        lon_i32=delta[:, 1],
+        scale=1e-5
+    )
+    
+    return
+
+
+def load_polyline_npz(path: 'str'):
+    """
+    Load a polyline saved with save_polyline_npz
+    
+    Parameters
+    ----------
+    path: string
+        Filename of the .npz file
+    
+    Returns
+    -------
+    lat, lon: numpy arrays, float64
+    """
+    with np.load(path) as npz:
+        # Dividing by the integer factor matches polyline_to_xy exactly
+        factor = round(1 / float(npz['scale']))
+        lat = np.cumsum(npz['lat_i32'], dtype=np.int64) / factor
+        lon = np.cumsum(npz['lon_i32'], dtype=np.int64) / factor
+    
+    return lat, lon
+
+
+def normalize_address(address: 'str'):
+    """
+    Uppercase an address and collapse whitespace so equivalent spellings
+    share a cache entry
+    
+    Parameters
+    ----------
+    address: string
+    
+    Returns
+    -------
+    address: string
+    """
+    return ' '.join(address.upper().split())
+
+
 def googlemaps_geocode(address: 'str'):
     """
-    Geocode an address via Google Maps geocode API
+    Geocode an address via Google Maps geocode API. Results are cached per
+    normalized address.
     
     Parameters
     ----------
@@ -125,32 +374,195 @@ def googlemaps_geocode(address: 'str'):
     ----
     - check how 'short_name' impacts street_number for appartment units
     """
-    gmaps = googlemaps.Client(key=credentials.GOOGLE_API_KEY)
-    geocode_result = gmaps.geocode(
-        address=address,
-        components={
-            'administrative_area_level_1': 'Alberta',
-            'country': 'Canada'
-        },
-        language='English'
-    )
-    address = pd.json_normalize(geocode_result[0], record_path=['address_components'])
-    address = ' '.join(address.loc[0:1, 'short_name']).upper()
+    lat, lon, address = _geocode_raw(normalize_address(address))
+    
+    loc = df_to_geodf(pd.DataFrame({
+        'latitude': [lat],
+        'longitude': [lon],
+        'address': [address]
+    }))
+    
+    return loc
+
+
+@functools.lru_cache(maxsize=1)
+def _get_gmaps_client():
+    """
+    Google Maps client, created once so its session keeps connections alive
+    between geocode calls
+    
+    Returns
+    -------
+    gmaps: googlemaps.Client
+    """
+    return googlemaps.Client(key=credentials.GOOGLE_API_KEY)
+
+
+def _geocode_cache_get(address: 'str'):
+    # Cached geocode result, None when missing or the cache cannot be opened
+    # (e.g. GEOCODE_CACHE_FILE's directory does not exist)
+    try:
+        with _GEOCODE_CACHE_LOCK, shelve.open(GEOCODE_CACHE_FILE) as cache:
+            return cache.get(address)
+    except dbm.error:
+        return None
+
+
+def _geocode_cache_set(address: 'str', geocode_result):
+    # Results that cannot be saved are simply requested again next time
+    try:
+        with _GEOCODE_CACHE_LOCK, shelve.open(GEOCODE_CACHE_FILE) as cache:
+            cache[address] = geocode_result
+    except dbm.error:
+        pass
+
+
+def _googlemaps_request(address: 'str'):
+    # Raw geocode results for a normalized address, restricted to Alberta.
+    # Read from the on-disk cache when the address was geocoded before.
+    geocode_result = _geocode_cache_get(address)
+    
+    if geocode_result is None:
+        geocode_result = _get_gmaps_client().geocode(
+            address=address,
+            components={
+                'administrative_area_level_1': 'Alberta',
+                'country': 'Canada'
+            },
+            language='English'
+        )
+        
+        # Empty results are not saved, so they are retried next time
+        if geocode_result:
+            _geocode_cache_set(address, geocode_result)
+    
+    return geocode_result
+
+
+@functools.lru_cache(maxsize=None)
+def _geocode_raw(address: 'str'):
+    """
+    Geocode a normalized address to plain values, without building a
+    Dataframe per address
     
-    loc = pd.json_normalize(geocode_result[0]['geometry']['location'])
-    loc.rename(columns={'lat': 'latitude',
-                        'lng': 'longitude'}, inplace=True)
+    Parameters
+    ----------
+    address: string
+    
+    Returns
+    -------
+    lat, lon, address: float, float, string
+        Missing coordinates and address when there is no match
+    """
+    geocode_result = _googlemaps_request(address)
     
-    loc['address'] = address
+    if not geocode_result:
+        return np.nan, np.nan, None
     
-    loc = df_to_geodf(loc)
+    # Street number and street name
+    components = geocode_result[0]['address_components']
+    address = ' '.join(c['short_name'] for c in components[:2]).upper()
+    
+    location = geocode_result[0]['geometry']['location']
+    
+    return location['lat'], location['lng'], address
+
+
+def geocode_many(addresses, max_workers: 'int'=10):
+    """
+    Geocode many addresses via Google Maps geocode API. Requests are sent
+    concurrently and the results are combined into a single GeoDataframe.
+    
+    Parameters
+    ----------
+    addresses: list of strings
+    max_workers: integer
+        Maximum number of concurrent requests, keep within the API rate
+        limit
+    
+    Returns
+    -------
+    loc: GeoDataframe
+        One row per input address, in order. Addresses without a match
+        have missing coordinates and geometry.
+    """
+    addresses = [normalize_address(a) for a in addresses]
+    # Each distinct address is only requested once
+    unique = list(dict.fromkeys(addresses))
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = dict(zip(unique, pool.map(_geocode_raw, unique)))
+    
+    # Collect plain columns and build the GeoDataframe once
+    lats, lons, addrs = [], [], []
+    for a in addresses:
+        lat, lon, addr = results[a]
+        lats.append(lat)
+        lons.append(lon)
+        addrs.append(addr)
+    
+    loc = df_to_geodf(pd.DataFrame({
+        'latitude': np.array(lats, dtype=np.float64),
+        'longitude': np.array(lons, dtype=np.float64),
+        'address': addrs
+    }))
     
     return loc
 
 
+@functools.lru_cache(maxsize=1)
+def _get_socrata():
+    """
+    Open Calgary API client, created once and reused
+    
+    Returns
+    -------
+    client: Socrata
+    """
+    return Socrata(
+        domain="data.calgary.ca",
+        app_token=credentials.OPEN_YYC_APP_TOKEN
+    )
+
+
+def load_yyc_addresses(path: 'str'=YYC_ADDRESS_FILE):
+    """
+    Open Calgary Parcel Address database indexed by uppercase address.
+    Downloaded once and saved to parquet, later sessions read the local file.
+    
+    Parameters
+    ----------
+    path: string
+        Parquet file of the saved dataset
+    
+    Returns
+    -------
+    db: Dataframe
+    """
+    global _YYC_ADDR_DB
+    
+    if _YYC_ADDR_DB is None:
+        if os.path.exists(path):
+            db = pd.read_parquet(path)
+        else:
+            results = _get_socrata().get(
+                dataset_identifier="9zvu-p8uz",
+                limit=2_000_000
+            )
+            
+            db = pd.DataFrame.from_records(results)
+            db.to_parquet(path)
+        
+        _YYC_ADDR_DB = db.set_index(db['address'].str.upper()).sort_index()
+    
+    return _YYC_ADDR_DB
+
+
 def open_calgary_geocode(address: 'str'):
     """
     Look up address by exact match in Open Calgary Parcel Address database.
+    The database is loaded once (see load_yyc_addresses) and searched
+    locally.
     
     Format: #UNIT house_number STREET NAME STREET_TYPE STREET_QUAD
     Example: #7V 20 COUNTRY HILLS VW NW
@@ -167,30 +579,46 @@ def open_calgary_geocode(address: 'str'):
     ----
     Test this function
     """
+    db = load_yyc_addresses()
     
-    client = Socrata(
-        domain="data.calgary.ca",
-        app_token=credentials.OPEN_YYC_APP_TOKEN
-    )
-
-    address = address.upper()
-
-    results = client.get(
-        dataset_identifier="9zvu-p8uz",
-        where=f'ADDRESS = "{address}"',
-    )
+    address = normalize_address(address)
     
-    if len(results) == 0:
+    if address not in db.index:
         print('No address found.')
         return
     
-    # Convert to pandas DataFrame
-    results_df = pd.DataFrame.from_records(results)
+    results_df = db.loc[[address]].reset_index(drop=True)
+    
+    return results_df
+
+
+def open_calgary_geocode_many(addresses):
+    """
+    Look up many addresses by exact match in Open Calgary Parcel Address
+    database, in a single indexed lookup on the local copy (see
+    load_yyc_addresses)
+    
+    Parameters
+    ----------
+    addresses: list of strings
+    
+    Returns
+    -------
+    results_df: Dataframe
+        Matching records in the order of the addresses, addresses without
+        a match are left out
+    """
+    db = load_yyc_addresses()
+    
+    keys = pd.Index([normalize_address(a) for a in addresses]).unique()
+    keys = keys[keys.isin(db.index)]
+    
+    results_df = db.loc[keys].reset_index(drop=True)
     
     return results_df
 
 
-def df_to_geodf(df):
+def df_to_geodf(df, lazy: 'bool'=False):
     """
     Convert Dataframe to GeoDataframe
     
@@ -198,23 +626,134 @@ def df_to_geodf(df):
     ----------
     df: Dataframe
         df contains columns 'latitude' and 'longitude'.
+    lazy: true, false (default)
+        Return df unchanged instead of building a POINT per row, for
+        consumers that only read the latitude and longitude columns.
         
     Returns
     -------
     gdf: GeoDataframe
-        gdf has added column 'geometry' of POINT geometries.
+        gdf has added column 'geometry' of POINT geometries in EPSG:4326,
+        missing where a coordinate is missing.
     """
+    if lazy:
+        return df
+    
+    # Contiguous float64 arrays are passed to shapely without another copy,
+    # and all points are built in one vectorized call
+    lon = np.ascontiguousarray(df['longitude'].to_numpy(), dtype=np.float64)
+    lat = np.ascontiguousarray(df['latitude'].to_numpy(), dtype=np.float64)
+    
+    # Rows with missing coordinates (e.g. addresses geocode_many could not
+    # match) get no geometry rather than POINT (NaN NaN)
+    points = shapely.points(lon, lat)
+    points[np.isnan(lon) | np.isnan(lat)] = None
+    
     gdf = gpd.GeoDataFrame(
         df,
-        geometry=gpd.points_from_xy(df['longitude'], df['latitude'])
+        geometry=points,
+        crs='EPSG:4326',
+        copy=False
     )
     
     return gdf
 
 
+def read_matrix(path: 'str'):
+    """
+    Read a saved matrix CSV (e.g. from OSRM.large_table). The first read
+    saves a parquet copy next to the CSV, later reads load the parquet file
+    instead of parsing the text again. The copy is rebuilt when the CSV is
+    newer.
+    
+    Parameters
+    ----------
+    path: string
+        Filename of the matrix CSV
+    
+    Returns
+    -------
+    matrix: numpy array of shape (n, n), float32
+    """
+    parquet = os.path.splitext(path)[0] + '.parquet'
+    
+    # Only trust the parquet copy if the CSV was not rewritten after it
+    if os.path.exists(parquet) and (
+        not os.path.exists(path)
+        or os.path.getmtime(parquet) >= os.path.getmtime(path)
+    ):
+        table = pq.read_table(parquet)
+    else:
+        # Column count from the first row, so every column is parsed
+        # straight to float32
+        with open(path) as f:
+            n = f.readline().count(',') + 1
+        
+        # The pyarrow reader parses blocks of the file on multiple threads
+        table = pacsv.read_csv(
+            pa.memory_map(path),
+            read_options=pacsv.ReadOptions(autogenerate_column_names=True),
+            convert_options=pacsv.ConvertOptions(
+                column_types={f'f{i}': pa.float32() for i in range(n)}
+            )
+        )
+        pq.write_table(table, parquet, compression='zstd')
+    
+    return np.column_stack([c.to_numpy() for c in table.columns])
+
+
+def euclidean_matrix(coordinates):
+    """
+    Straight-line distance matrix in metres between all coordinates, a
+    fallback when no OSRM server is available. Distances are measured on the
+    Web Mercator projection (see mercator_xy), which is scaled back to
+    ground distance at the mean latitude.
+    
+    Parameters
+    ----------
+    coordinates: Dataframe
+        Contains columns ['latitude', 'longitude']
+    
+    Returns
+    -------
+    matrix: numpy array of shape (n, n)
+    """
+    xy = mercator_xy(coordinates)
+    
+    # Mercator stretches both axes by 1 / cos(latitude)
+    scale = np.cos(np.radians(coordinates['latitude'].mean()))
+    
+    return (cdist(xy, xy, metric='euclidean') * scale).astype(np.float32)
+
+
+def mercator_xy(coordinates):
+    """
+    Project coordinates to Web Mercator metres, so that euclidean distances
+    are locally proportional to ground distances
+    
+    Parameters
+    ----------
+    coordinates: Dataframe
+        Contains columns ['latitude', 'longitude']
+    
+    Returns
+    -------
+    xy: numpy array of shape (n, 2)
+    """
+    lat = np.radians(coordinates['latitude'].to_numpy(dtype=np.float64))
+    lon = np.radians(coordinates['longitude'].to_numpy(dtype=np.float64))
+    
+    r = 6_378_137.0
+    return np.column_stack((r * lon, r * np.log(np.tan(np.pi / 4 + lat / 2))))
+
+
 def label_routes(
     n_routes: 'int',
-    matrix: 'str'='../data/duration_matrix_20220216-222102.csv'
+    matrix: 'str | np.ndarray'='../data/duration_matrix_20220216-222102.csv',
+    method: 'str'='agglomerative',
+    addresses=None,
+    n_neighbors: 'int'=30,
+    random_state: 'int | None'=0
 ):
     """
 
@@ -223,32 +762,96 @@ def label_routes(
     n_routes: integer
         The number of routes to generate equal to the number of drivers
         available
-    matrix: string
-        Filename of distance matrix to use
+    matrix: string or numpy array
+        Filename of distance matrix to use, or the matrix itself (e.g. from
+        OSRM.table_matrix or euclidean_matrix). Only used by
+        'agglomerative'.
+    method: 'agglomerative' (default), 'kmeans', 'cuml_kmeans', 'ward'
+        agglomerative: complete linkage on the precomputed n x n matrix,
+        O(n^2) memory, suited to small n.
+        kmeans: MiniBatchKMeans on the projected address coordinates, needs
+        no matrix and scales to large n.
+        cuml_kmeans: k-means on the GPU with cuML, which must be installed
+        with a working GPU.
+        ward: Ward linkage on the projected address coordinates, merging
+        only along a sparse k-nearest-neighbour graph, O(n * n_neighbors)
+        memory.
+    addresses: Dataframe | GeoDataframe
+        Contains columns ['latitude', 'longitude'], required for 'kmeans',
+        'cuml_kmeans' and 'ward'
+    n_neighbors: integer
+        Number of neighbours per address in the 'ward' connectivity graph
+    random_state: integer or None
+        Seed for 'kmeans' and 'cuml_kmeans', fixed by default so the routes are the same on
+        every run. None gives a different clustering each run.
 
     Returns
     -------
     List of route numbers, where the index corresponds to the address
     """
+    
+    if method in ('kmeans', 'cuml_kmeans', 'ward') and addresses is None:
+        raise ValueError(f"method='{method}' requires addresses")
+    
+    if method == 'ward':
+        xy = mercator_xy(addresses)
+        
+        clustering = AgglomerativeClustering(
+            n_clusters=n_routes,
+            connectivity=kneighbors_graph(xy, n_neighbors=n_neighbors),
+            linkage='ward'
+        ).fit(xy)
+        
+        return clustering.labels_
+    
+    if method == 'cuml_kmeans':
+        # Imported here, loading cuML initialises CUDA. cuML has no complete
+        # linkage on a precomputed matrix, so only k-means runs on the GPU.
+        try:
+            from cuml.cluster import KMeans as cuKMeans
+        except Exception as e:
+            raise RuntimeError(
+                "method='cuml_kmeans' requires cuML with a working GPU"
+            ) from e
+        
+        clustering = cuKMeans(
+            n_clusters=n_routes,
+            random_state=random_state,
+            output_type='numpy'
+        ).fit(mercator_xy(addresses))
+        
+        return clustering.labels_
+    
+    if method == 'kmeans':
+        xy = mercator_xy(addresses)
+        
+        clustering = MiniBatchKMeans(
+            n_clusters=n_routes,
+            batch_size=1024,
+            n_init='auto',
+            random_state=random_state
+        ).fit(xy)
+        
+        return clustering.labels_
+    
+    if method != 'agglomerative':
+        raise ValueError(f'Unknown method: {method}')
 
-    # Load distance matrix
-    df = pd.read_csv(matrix, header=None)
-
-    # Build pipeline
-    estimators = [
-        ('scaler', MinMaxScaler()),
-        ('clustering', AgglomerativeClustering(
-            n_clusters=n_routes, 
-            affinity='precomputed', 
-            linkage='complete'
-        ))
-    ]
-
-    pipe = Pipeline(estimators)
+    # Load distance matrix, float32 halves the memory of the n x n matrix
+    if isinstance(matrix, str):
+        matrix = read_matrix(matrix)
+    else:
+        matrix = np.asarray(matrix, dtype=np.float32)
 
-    pipe.fit(df)
+    # The matrix is used as is, column-wise scaling would distort the
+    # pairwise distances
+    clustering = AgglomerativeClustering(
+        n_clusters=n_routes,
+        metric='precomputed',
+        linkage='complete'
+    ).fit(matrix)
 
-    return pipe['clustering'].labels_
+    return clustering.labels_
 
 
 def parse_routes(route_table, addresses):
@@ -266,22 +869,27 @@ def parse_routes(route_table, addresses):
     -------
     a: Dataframe
     """
-    a = pd.DataFrame()
+    # One row per waypoint, labelled with its route (route table index) and
+    # its position in the trip request
+    waypoints = route_table['waypoints'].explode().dropna()
+    waypoints = pd.DataFrame({
+        'route': waypoints.index,
+        'r_index': waypoints.groupby(level=0).cumcount().to_numpy(),
+        'waypoint_index': [w['waypoint_index'] for w in waypoints]
+    })
     
-    for i, route in route_table.iterrows():
-        route_addresses = addresses[addresses['route'] == i].copy()
-        
-        route_addresses['r_index'] = route_addresses.reset_index().index + 1
-        # ^ Note: +1 since the waypoint index includes the warehouse
-        
-        # Add waypoint index (route sequence)
-        waypoints = pd.json_normalize(route['waypoints'])
-        
-        t2 = pd.merge(route_addresses, waypoints['waypoint_index'],
-                     left_on='r_index', right_index=True)
-        a = pd.concat([a, t2])
+    a = addresses.copy()
+    a['r_index'] = a.groupby('route').cumcount() + 1
+    # ^ Note: +1 since the waypoint index includes the warehouse
     
-    return a
+    # Add waypoint index (route sequence) to every address in a single merge
+    index = a.index
+    a = a.reset_index(drop=True)
+    a['_order'] = range(len(a))
+    a = pd.merge(a, waypoints, on=['route', 'r_index'])
+    a.index = index[a.pop('_order')]
+    
+    return a.sort_values('route', kind='stable')
 
 
 def plot_routes(route_table, addresses, warehouse):
@@ -292,6 +900,9 @@ def plot_routes(route_table, addresses, warehouse):
     ----------
     route_table: Dataframe
         The output of OSRM.tsp_polylines()
+    addresses, warehouse: Dataframe | GeoDataframe
+        Contain columns 'latitude' and 'longitude', geometries are not
+        required (see df_to_geodf lazy)
     
     Returns
     -------
@@ -306,22 +917,39 @@ def plot_routes(route_table, addresses, warehouse):
     fig = go.Figure()
     traces = []
     
-    for i, route in route_table.iterrows():
-        # Plot route
-        t1 = polyline_to_geodf(route['geometry'])
-
+    # Routes are grouped into one line trace per colour of a cycled palette,
+    # a NaN point after each route breaks the line between routes of the
+    # same colour. Hovering a line shows its route.
+    palette = px.colors.qualitative.Plotly
+    groups = [([], [], []) for _ in palette]
+    for k, (i, geometry) in enumerate(route_table['geometry'].items()):
+        # Plot route, only the raw coordinates are needed
+        lat, lon = polyline_to_xy(geometry)
+        
+        lats, lons, names = groups[k % len(palette)]
+        lats += [lat, [np.nan]]
+        lons += [lon, [np.nan]]
+        names.append(np.full(len(lat) + 1, f'Route {i}', dtype=object))
+    
+    for colour, (lats, lons, names) in zip(palette, groups):
+        if not names:
+            continue
+        
         fig.add_scattermapbox(
             mode="lines",
-            lat=t1.geometry.y,
-            lon=t1.geometry.x,
-            name=f'Route {i}', 
+            lat=np.concatenate(lats),
+            lon=np.concatenate(lons),
+            line={'color': colour},
+            hovertext=np.concatenate(names),
+            hoverinfo='text',
+            showlegend=False,
             # fill='toself'
         )
 
     traces.append(px.scatter_mapbox(
         addresses,
-        lat=addresses.geometry.y,
-        lon=addresses.geometry.x,
+        lat='latitude',
+        lon='longitude',
         color='route',
         hover_name='waypoint_index',
         hover_data=['address']
@@ -329,8 +957,8 @@ def plot_routes(route_table, addresses, warehouse):
     
     traces.append(px.scatter_mapbox(
         warehouse,
-        lat=warehouse.geometry.y,
-        lon=warehouse.geometry.x,
+        lat='latitude',
+        lon='longitude',
         hover_data=['address']
     ).data[0])
     